@@ -1,7 +1,15 @@
-
 import os
 import uvicorn
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
-    uvicorn.run("server:app", host="0.0.0.0", port=port, reload=False)
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=port,
+        reload=False,
+        # "auto" (the default) runs on uvloop when it is installed (not on Windows)
+        loop="auto",
+        # μ-law audio doesn't compress; deflate on the Twilio socket only costs CPU
+        ws_per_message_deflate=False,
+    )
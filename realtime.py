@@ -3,10 +3,20 @@
 # Codec: PCMU (G.711 μ-law) 8kHz
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-import asyncio, os, json, websockets, base64
+import asyncio, logging, os, ssl, websockets, pybase64
+from websockets.frames import Frame, Opcode
+from collections import deque
+from contextlib import asynccontextmanager
+import orjson
+import msgspec
+import numpy as np
+
+log = logging.getLogger(__name__)
 
-router = APIRouter()
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
+RMS_BACKEND = os.getenv("RMS_BACKEND", "numpy")   # "numba" to JIT the RMS kernel
+_b64decode = pybase64.b64decode   # SIMD decoder, drop-in for base64.b64decode
+_b64encode = pybase64.b64encode
 
 # -------- μ-law decode (for barge-in gate) --------
 SIGN_BIT = 0x80
@@ -20,48 +30,326 @@ def mulaw_byte_to_pcm16(b: int) -> int:
     mantissa = b & QUANT_MASK
     magnitude = ((mantissa << 4) + BIAS) << exponent
     sample = magnitude - BIAS
-    return -sample if sign else sample
-
-def rms_from_mulaw_bytes(mu_bytes: bytes) -> float:
-    if not mu_bytes:
-        return 0.0
-    acc = 0
-    n = len(mu_bytes)
-    for bt in mu_bytes:
-        s = mulaw_byte_to_pcm16(bt)
-        acc += s * s
-    return (acc / n) ** 0.5
+    # branchless negate: mask is -1 when the sign bit is set, else 0
+    mask = -(sign >> 7)
+    return (sample ^ mask) - mask
+
+# 256-entry decode table, built once at import
+MULAW_TO_PCM16 = np.array([mulaw_byte_to_pcm16(b) for b in range(256)], dtype=np.int32)
+# squared samples, so the RMS kernel is a single gather + mean
+MULAW_SQ = MULAW_TO_PCM16.astype(np.int64) ** 2
+
+# Optional Numba kernel: one native call per frame, at the cost of JIT warmup
+# (cached on disk after the first run). Off by default to keep cold starts fast.
+if RMS_BACKEND == "numba":
+    from numba import njit
+
+    @njit(cache=True, fastmath=True)
+    def _rms_mulaw(buf):
+        acc = 0
+        for i in range(len(buf)):
+            b = (~buf[i]) & 0xFF
+            # sign is irrelevant once squared, so the loop body has no branch
+            s = ((((b & QUANT_MASK) << 4) + BIAS) << ((b >> 4) & 0x07)) - BIAS
+            acc += s * s
+        return (acc / len(buf)) ** 0.5
+
+    def rms_from_mulaw_bytes(mu_bytes: bytes) -> float:
+        if not mu_bytes:
+            return 0.0
+        return _rms_mulaw(np.frombuffer(mu_bytes, dtype=np.uint8))
+else:
+    # Reused gather output so per-frame RMS doesn't allocate. Twilio frames are
+    # 160 bytes; anything larger than the scratch falls back to a fresh array.
+    _SQ_SCRATCH = np.empty(240, dtype=np.int64)
+
+    def rms_from_mulaw_bytes(mu_bytes: bytes) -> float:
+        if not mu_bytes:
+            return 0.0
+        a = np.frombuffer(mu_bytes, dtype=np.uint8)
+        if a.size <= _SQ_SCRATCH.size:
+            # mode="clip" lets take() write into `out` directly (uint8 is always in range)
+            sq = np.take(MULAW_SQ, a, out=_SQ_SCRATCH[:a.size], mode="clip")
+        else:
+            sq = MULAW_SQ[a]
+        return float(np.sqrt(sq.mean()))
+
+# -------- barge-in gate (noise immune) --------
+FRAME_MS = 20
+LOUD_MS_REQUIRED = 120   # ~120ms of real voice to trigger barge-in
+RMS_GATE = 8000          # higher = less sensitive, lower = more
+
+# μ-law magnitude grows as (byte & 0x7F) shrinks, so a frame's peak sample is
+# its smallest masked byte. No sample reaching RMS_GATE means RMS can't either.
+PEAK_TABLE = bytes(b & 0x7F for b in range(256))
+BYTE_GATE = max(b & 0x7F for b in range(256) if abs(mulaw_byte_to_pcm16(b)) >= RMS_GATE)
+
+def is_loud_frame(mu_bytes: bytes) -> bool:
+    # cheap peak test first; only frames that could pass pay for the RMS
+    if not mu_bytes or min(mu_bytes.translate(PEAK_TABLE)) > BYTE_GATE:
+        return False
+    return rms_from_mulaw_bytes(mu_bytes) >= RMS_GATE
+
+# -------- caller silence --------
+# Twilio streams frames even when the line is quiet; frames whose peak stays
+# under SILENCE_PEAK don't push the silence-commit deadline.
+SILENCE_PEAK = 500
+SILENCE_BYTE_GATE = max(b & 0x7F for b in range(256) if abs(mulaw_byte_to_pcm16(b)) >= SILENCE_PEAK)
+
+def is_silent_frame(mu_bytes: bytes) -> bool:
+    return min(mu_bytes.translate(PEAK_TABLE), default=0x7F) > SILENCE_BYTE_GATE
 
 # -------- OpenAI Realtime session --------
+SESSION = {
+    "type": "realtime",
+    "model": "gpt-realtime",
+    "output_modalities": ["audio"],
+    "audio": {
+        "input": {
+            "format": {"type": "audio/pcmu"},
+            "turn_detection": {"type": "server_vad", "silence_duration_ms": 500}
+        },
+        "output": {
+            "format": {"type": "audio/pcmu"},
+            "voice": "alloy"
+        }
+    },
+    "instructions": (
+        "You are a premium human receptionist for Vesta. "
+        "Speak natural English unless the caller clearly prefers another language. "
+        "Be warm, concise, one question at a time, respond quickly. "
+        "If the caller interrupts, stop speaking immediately and listen."
+    ),
+}
+
+# Serialized once per process; every call sends the same session config.
+SESSION_UPDATE = orjson.dumps({"type": "session.update", "session": SESSION}).decode()
+
+# With server VAD the model reports caller speech itself
+# (input_audio_buffer.speech_started), so the client-side RMS gate is skipped.
+SERVER_VAD_ENABLED = SESSION["audio"]["input"]["turn_detection"]["type"] == "server_vad"
+
+# Constant control frames
+COMMIT = orjson.dumps({"type": "input_audio_buffer.commit"}).decode()
+CLEAR = orjson.dumps({"type": "input_audio_buffer.clear"}).decode()
+CANCEL = orjson.dumps({"type": "response.cancel"}).decode()
+
+def response_cancel(response_id: str) -> str:
+    return orjson.dumps({"type": "response.cancel", "response_id": response_id}).decode()
+
+GREETING_TEXT = "Hi, thanks for calling Vesta. How can I help you today?"
+
+def response_create(modalities_key: str, **response) -> str:
+    return orjson.dumps({
+        "type": "response.create",
+        "response": {modalities_key: ["audio"], **response}
+    }).decode()
+
+# response.create frames keyed by the schema the server speaks:
+# GA sessions use "output_modalities", beta sessions "modalities".
+RESPONSE_CREATE = {k: response_create(k) for k in ("output_modalities", "modalities")}
+GREETING = {k: response_create(k, instructions=GREETING_TEXT) for k in RESPONSE_CREATE}
+
+# Inbound caller audio is forwarded as prefix + base64 payload + suffix
+APPEND_PREFIX = '{"type":"input_audio_buffer.append","audio":"'
+APPEND_SUFFIX = '"}'
+
+# Outbound Twilio media frame is prefix + base64 payload + suffix
+MEDIA_SUFFIX = '"}}'
+MAX_MEDIA_BYTES = 8000   # cap on μ-law bytes merged into one Twilio frame (1 s)
+MAX_QUEUED_DELTAS = 64   # per call; a full queue makes the OpenAI reader wait for the writer
+
+def media_prefix(stream_sid: str) -> str:
+    return '{"event":"media","streamSid":' + orjson.dumps(stream_sid).decode() + ',"media":{"payload":"'
+
+# Audio deltas are spliced into the Twilio frame as raw JSON string content,
+# without decoding the event. Quotes inside string values are always escaped,
+# so these needles can only match real keys.
+DELTA_TYPE = '"type":"response.output_audio.delta"'
+DELTA_KEY = '"delta":"'
+
+def raw_audio_delta(message: str):
+    """Raw JSON text of an audio delta's payload, or None for any other event."""
+    if DELTA_TYPE not in message:
+        return None
+    start = message.find(DELTA_KEY)
+    if start < 0:
+        return None
+    start += len(DELTA_KEY)
+    end = message.find('"', start)
+    return message[start:end] if end >= 0 else None
+
+# -------- typed event decoding --------
+# msgspec decodes straight into these structs and skips fields we don't
+# declare, so no dict is built per frame.
+class StreamStart(msgspec.Struct):
+    streamSid: str
+
+class MediaPayload(msgspec.Struct):
+    payload: str
+
+class TwilioConnected(msgspec.Struct, tag_field="event", tag="connected"):
+    pass
+
+class TwilioStart(msgspec.Struct, tag_field="event", tag="start"):
+    start: StreamStart
+
+class TwilioMedia(msgspec.Struct, tag_field="event", tag="media"):
+    media: MediaPayload
+
+class TwilioMark(msgspec.Struct, tag_field="event", tag="mark"):
+    pass
+
+class TwilioDtmf(msgspec.Struct, tag_field="event", tag="dtmf"):
+    pass
+
+class TwilioStop(msgspec.Struct, tag_field="event", tag="stop"):
+    pass
+
+twilio_decoder = msgspec.json.Decoder(
+    TwilioConnected | TwilioStart | TwilioMedia | TwilioMark | TwilioDtmf | TwilioStop
+)
+
+# OpenAI has too many event types for a tagged union; one struct with the
+# fields we read covers all of them.
+class ResponseRef(msgspec.Struct):
+    id: str | None = None
+
+class OpenAIEvent(msgspec.Struct):
+    type: str
+    id: str | None = None
+    delta: str | None = None
+    response: ResponseRef | None = None
+
+openai_decoder = msgspec.json.Decoder(OpenAIEvent)
+
+def decode_twilio(msg):
+    """Typed Twilio event, or None for events we don't model."""
+    try:
+        return twilio_decoder.decode(msg)
+    except msgspec.ValidationError:
+        return None
+
+def decode_openai(msg):
+    try:
+        return openai_decoder.decode(msg)
+    except msgspec.ValidationError:
+        return None
+
+# One TLS context for every OpenAI connect; building it loads the CA store
+OPENAI_SSL = ssl.create_default_context()
+
 async def connect_openai():
+    """Open a configured session; returns (ws, modalities_key) for response.create."""
     url = "wss://api.openai.com/v1/realtime?model=gpt-realtime"
     headers = { "Authorization": f"Bearer {OPENAI_KEY}" }
-    ws = await websockets.connect(url, extra_headers=headers)
-    await ws.send(json.dumps({
-        "type": "session.update",
-        "session": {
-            "type": "realtime",
-            "model": "gpt-realtime",
-            "output_modalities": ["audio"],
-            "audio": {
-                "input": {
-                    "format": {"type": "audio/pcmu"},
-                    "turn_detection": {"type": "server_vad", "silence_duration_ms": 500}
-                },
-                "output": {
-                    "format": {"type": "audio/pcmu"},
-                    "voice": "alloy"
-                }
-            },
-            "instructions": (
-                "You are a premium human receptionist for Vesta. "
-                "Speak natural English unless the caller clearly prefers another language. "
-                "Be warm, concise, one question at a time, respond quickly. "
-                "If the caller interrupts, stop speaking immediately and listen."
-            ),
-        }
-    }))
-    return ws
+    # Small high-rate audio frames: no queue backpressure, bigger buffers, and
+    # no permessage-deflate (base64 μ-law doesn't compress, zlib just burns CPU)
+    ws = await websockets.connect(
+        url,
+        extra_headers=headers,
+        max_queue=None,
+        read_limit=2**20,
+        write_limit=2**20,
+        compression=None,
+        ssl=OPENAI_SSL,
+    )
+    # First server message is session.created; its shape tells us the schema
+    created = orjson.loads(await ws.recv())
+    session = created.get("session") or {}
+    modalities_key = "modalities" if "modalities" in session else "output_modalities"
+    await ws.send(SESSION_UPDATE)
+    return ws, modalities_key
+
+async def send_batch(ws, *messages: str):
+    """Send text messages back to back as one transport write (one syscall / TLS record)."""
+    await ws.ensure_open()
+    ws.transport.write(b"".join(
+        Frame(Opcode.TEXT, m.encode()).serialize(mask=True, extensions=ws.extensions)
+        for m in messages
+    ))
+    await ws.drain()
+
+# -------- pre-warmed OpenAI sessions --------
+# The TLS handshake, websocket upgrade and session.update happen ahead of the
+# call. A pooled session serves exactly one call: it keeps its conversation,
+# so handing it back for the next caller would leak the previous call.
+OPENAI_POOL_SIZE = int(os.getenv("OPENAI_POOL_SIZE", "2"))
+OPENAI_POOL_MAX_IDLE = 600   # seconds; idle sessions are replaced at this age
+OPENAI_POOL_RETRY_MAX = 30  # seconds; backoff cap between failed warm-ups
+# ws -> (modalities_key, expiry TimerHandle), oldest first
+OPENAI_POOL: dict = {}
+_pool_tasks = set()
+
+def _pool_spawn(coro):
+    task = asyncio.create_task(coro)
+    _pool_tasks.add(task)
+    task.add_done_callback(_pool_tasks.discard)
+
+def _expire_pooled(ws):
+    # refreshed in the background, so a call rarely finds an aged session
+    if OPENAI_POOL.pop(ws, None) is None:
+        return
+    _pool_spawn(ws.close())
+    replenish_pool()
+
+async def add_pooled_session():
+    # keep retrying so a failed warm-up doesn't shrink the pool for good
+    delay = 1
+    while True:
+        try:
+            ws, modalities_key = await connect_openai()
+            break
+        except websockets.InvalidStatusCode as e:
+            if e.status_code in (401, 403):
+                log.error("OpenAI rejected the pool warm-up (HTTP %s); not retrying", e.status_code)
+                return
+            log.warning("OpenAI pool warm-up failed (HTTP %s); retrying in %ss", e.status_code, delay)
+        except Exception as e:
+            log.warning("OpenAI pool warm-up failed (%r); retrying in %ss", e, delay)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, OPENAI_POOL_RETRY_MAX)
+    expiry = asyncio.get_running_loop().call_later(OPENAI_POOL_MAX_IDLE, _expire_pooled, ws)
+    OPENAI_POOL[ws] = (modalities_key, expiry)
+
+def replenish_pool():
+    _pool_spawn(add_pooled_session())
+
+async def checkout_openai():
+    """A warm (ws, modalities_key) from the pool, or a fresh connection if none is usable."""
+    while OPENAI_POOL:
+        ws = next(iter(OPENAI_POOL))
+        modalities_key, expiry = OPENAI_POOL.pop(ws)
+        expiry.cancel()
+        replenish_pool()
+        if ws.open:
+            return ws, modalities_key
+        # the close handshake can take seconds; keep it off the call's path
+        _pool_spawn(ws.close())
+    return await connect_openai()
+
+@asynccontextmanager
+async def openai_pool_lifespan(app):
+    # warm in the background so an unreachable API can't hold up startup
+    for _ in range(OPENAI_POOL_SIZE):
+        replenish_pool()
+    yield
+    for task in list(_pool_tasks):
+        task.cancel()
+    for ws, (_, expiry) in list(OPENAI_POOL.items()):
+        expiry.cancel()
+        await ws.close()
+    OPENAI_POOL.clear()
+
+router = APIRouter(lifespan=openai_pool_lifespan)
+
+async def receive_frame(ws: WebSocket):
+    """Next raw Twilio message (str or bytes), without Starlette's receive_text wrapper."""
+    msg = await ws.receive()
+    if msg["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(msg.get("code", 1000))
+    text = msg.get("text")
+    return text if text is not None else msg["bytes"]
 
 @router.websocket("/ws")
 async def ws_endpoint(twilio_ws: WebSocket):
@@ -72,150 +360,255 @@ async def ws_endpoint(twilio_ws: WebSocket):
     speaking = False
     suppress_outbound = False
     current_response_id = None
+    last_cancelled_id = None
 
     # --- Twilio start: get streamSid ---
     while stream_sid is None:
-        start_msg = await twilio_ws.receive_text()
-        start_data = json.loads(start_msg)
-        if start_data.get("event") == "start":
-            stream_sid = start_data["start"]["streamSid"]
-
-    openai_ws = await connect_openai()
-
-    # --- guaranteed greeting (dual schema) ---
-    async def send_greeting():
-        # Schema A
-        await openai_ws.send(json.dumps({
-            "type": "response.create",
-            "response": {
-                "modalities": ["audio"],
-                "instructions": "Hi, thanks for calling Vesta. How can I help you today?"
-            }
-        }))
-        # Schema B
-        await openai_ws.send(json.dumps({
-            "type": "response.create",
-            "modalities": ["audio"],
-            "instructions": "Hi, thanks for calling Vesta. How can I help you today?"
-        }))
-
-    await send_greeting()
-    asyncio.create_task(asyncio.sleep(1.5))  # small buffer before listening
+        ev = decode_twilio(await receive_frame(twilio_ws))
+        if isinstance(ev, TwilioStart):
+            stream_sid = ev.start.streamSid
+    media_head = media_prefix(stream_sid)
+
+    openai_ws, modalities_key = await checkout_openai()
+    response_create_frame = RESPONSE_CREATE[modalities_key]
+
+    # --- greeting ---
+    await openai_ws.send(GREETING[modalities_key])
+
+    loop = asyncio.get_running_loop()
 
     # --- quick reply after caller pause ---
+    # Each frame only pushes a deadline forward. A single TimerHandle fires at
+    # the deadline it was armed with and re-arms itself if the deadline moved;
+    # a Task is only created for an actual commit.
     silence_delay_ms = 450
+    commit_deadline = 0.0
+    commit_timer = None   # set while caller audio is waiting to be committed
     commit_task = None
 
-    async def schedule_commit():
-        nonlocal commit_task
-        if commit_task and not commit_task.done():
-            commit_task.cancel()
-        commit_task = asyncio.create_task(commit_after_delay())
+    def schedule_commit():
+        nonlocal commit_deadline, commit_timer
+        commit_deadline = loop.time() + silence_delay_ms / 1000
+        if commit_timer is None:
+            commit_timer = loop.call_at(commit_deadline, commit_due)
+
+    def commit_due():
+        nonlocal commit_timer, commit_task
+        if loop.time() < commit_deadline:
+            commit_timer = loop.call_at(commit_deadline, commit_due)
+            return
+        commit_timer = None
+        commit_task = asyncio.create_task(send_commit())
+
+    async def send_commit():
+        try:
+            await send_batch(openai_ws, COMMIT, response_create_frame)
+        except Exception:
+            pass
+
+    # --- outbound audio: deltas are queued, a single writer drains them ---
+    # Whatever has piled up while the previous send was in flight goes out as
+    # one merged media frame; an idle writer forwards single deltas untouched.
+    outq = deque()
+    out_ready = loop.create_future()
+    out_space = None   # set while the OpenAI reader waits for room in outq
+
+    def wake_producer():
+        if out_space is not None and not out_space.done():
+            out_space.set_result(None)
 
-    async def commit_after_delay():
+    async def wait_for_space():
+        nonlocal out_space
+        out_space = loop.create_future()
+        await out_space
+
+    def enqueue_media(delta_b64: str):
+        outq.append(delta_b64)
+        if not out_ready.done():
+            out_ready.set_result(None)
+
+    # Merged audio is assembled in one buffer per call. len(b64) * 3 // 4 never
+    # underestimates the decoded size, so writes stay inside it.
+    merge_buf = bytearray(MAX_MEDIA_BYTES)
+    merge_view = memoryview(merge_buf)
+
+    def next_payload() -> str:
+        texts = [outq.popleft()]
+        size = len(texts[0]) * 3 // 4
+        while outq and size + len(outq[0]) * 3 // 4 <= MAX_MEDIA_BYTES:
+            texts.append(outq.popleft())
+            size += len(texts[-1]) * 3 // 4
+        # Unpadded base64 ends on a 3-byte boundary, so it concatenates as text;
+        # only a padded chunk before the end forces decode + re-encode.
+        if all(len(t) % 4 == 0 and not t.endswith("=") for t in texts[:-1]):
+            return "".join(texts)
+        size = 0
+        for t in texts:
+            chunk = _b64decode(t, validate=False)
+            merge_buf[size:size + len(chunk)] = chunk
+            size += len(chunk)
+        return _b64encode(merge_view[:size]).decode("ascii")
+
+    async def twilio_writer():
+        nonlocal out_ready
         try:
-            await asyncio.sleep(silence_delay_ms / 1000)
-            await openai_ws.send(json.dumps({"type": "input_audio_buffer.commit"}))
-            # Dual schema request to guarantee voice output
-            await openai_ws.send(json.dumps({"type": "response.create", "response": {"modalities": ["audio"]}}))
-            await openai_ws.send(json.dumps({"type": "response.create", "modalities": ["audio"]}))
-        except asyncio.CancelledError:
+            while True:
+                await out_ready
+                out_ready = loop.create_future()
+                while outq:
+                    payload = next_payload()
+                    wake_producer()
+                    await twilio_ws.send_text(media_head + payload + MEDIA_SUFFIX)
+        except Exception:
             pass
 
-    async def hard_cancel():
-        """Stop bot speech immediately (no more audio to Twilio) and cancel model turn."""
-        nonlocal speaking, suppress_outbound, current_response_id
+    async def hard_cancel(clear_input=True):
+        """Stop bot speech immediately (no more audio to Twilio) and cancel model turn.
+
+        clear_input also drops the uncommitted input buffer; server-VAD barge-in
+        passes False so the interrupting caller's first words are kept.
+        """
+        nonlocal speaking, suppress_outbound, last_cancelled_id
+        # at most one cancel per response
+        if current_response_id is not None and current_response_id == last_cancelled_id:
+            return
         suppress_outbound = True
         speaking = False
+        outq.clear()
+        wake_producer()
+        last_cancelled_id = current_response_id
         try:
-            if current_response_id:
-                await openai_ws.send(json.dumps({"type": "response.cancel", "response": {"id": current_response_id}}))
-            await openai_ws.send(json.dumps({"type": "response.cancel"}))
-            await openai_ws.send(json.dumps({"type": "input_audio_buffer.clear"}))
+            cancel = response_cancel(current_response_id) if current_response_id else CANCEL
+            if clear_input:
+                await send_batch(openai_ws, cancel, CLEAR)
+            else:
+                await openai_ws.send(cancel)
         except:
             pass
-        current_response_id = None
 
-    # --- barge-in gate (noise immune) ---
-    FRAME_MS = 20
-    LOUD_MS_REQUIRED = 120   # ~120ms of real voice to trigger barge-in
-    RMS_GATE = 8000          # higher = less sensitive, lower = more
+    # --- barge-in gate state ---
     loud_ms_accum = 0
 
     async def twilio_to_openai():
         nonlocal loud_ms_accum, suppress_outbound
         try:
             while True:
-                msg = await twilio_ws.receive_text()
-                data = json.loads(msg)
-                ev = data.get("event")
-
-                if ev == "media":
-                    mu_b64 = data["media"]["payload"]
-                    mu_bytes = base64.b64decode(mu_b64)
-
-                    # Detect caller talking while bot is speaking
-                    if speaking:
-                        frame_rms = rms_from_mulaw_bytes(mu_bytes)
-                        if frame_rms >= RMS_GATE:
-                            loud_ms_accum += FRAME_MS
-                            if loud_ms_accum >= LOUD_MS_REQUIRED:
-                                await hard_cancel()
+                match decode_twilio(await receive_frame(twilio_ws)):
+                    case TwilioMedia(media=MediaPayload(payload=mu_b64)):
+                        # Server VAD owns barge-in and turn-end (it commits and creates
+                        # the response). Only the client-driven path runs the local
+                        # gates, so only it decodes; the model gets the base64 as-is.
+                        if not SERVER_VAD_ENABLED:
+                            mu_bytes = _b64decode(mu_b64, validate=False)
+
+                            # Detect caller talking while bot is speaking
+                            if speaking and is_loud_frame(mu_bytes):
+                                loud_ms_accum += FRAME_MS
+                                if loud_ms_accum >= LOUD_MS_REQUIRED:
+                                    await hard_cancel()
+                                    loud_ms_accum = 0
+                            else:
                                 loud_ms_accum = 0
-                        else:
-                            loud_ms_accum = 0
-                    else:
-                        loud_ms_accum = 0
-
-                    # Always send caller audio to model
-                    await openai_ws.send(json.dumps({
-                        "type": "input_audio_buffer.append",
-                        "audio": mu_b64
-                    }))
-                    await schedule_commit()
-
-                elif ev == "stop":
-                    break
+
+                        # Always send caller audio to model
+                        await openai_ws.send(APPEND_PREFIX + mu_b64 + APPEND_SUFFIX)
+                        if not SERVER_VAD_ENABLED and not is_silent_frame(mu_bytes):
+                            schedule_commit()
+
+                    case TwilioStop():
+                        break
         except WebSocketDisconnect:
             pass
         finally:
-            try:
-                await openai_ws.send(json.dumps({"type": "input_audio_buffer.commit"}))
-                await openai_ws.send(json.dumps({"type": "response.create", "response": {"modalities": ["audio"]}}))
-                await openai_ws.send(json.dumps({"type": "response.create", "modalities": ["audio"]}))
-            except:
-                pass
+            # flush only input the silence timer hasn't committed yet
+            if commit_timer is not None:
+                commit_timer.cancel()
+                await send_commit()
+
+    # --- OpenAI events, dispatched by type ---
+    # Handlers are plain functions; the few that need to wait return an
+    # awaitable, everything else returns None and costs no coroutine.
+    def play_delta(delta_b64):
+        nonlocal speaking
+        if suppress_outbound or not delta_b64:
+            return None
+        speaking = True
+        if len(outq) < MAX_QUEUED_DELTAS:
+            enqueue_media(delta_b64)
+            return None
+        return enqueue_when_room(delta_b64)
+
+    async def enqueue_when_room(delta_b64):
+        # backpressure: a full queue waits for the writer instead of dropping audio
+        while len(outq) >= MAX_QUEUED_DELTAS:
+            await wait_for_space()
+            if suppress_outbound:   # barge-in while waiting
+                return
+        enqueue_media(delta_b64)
+
+    def on_response_created(event):
+        nonlocal suppress_outbound, current_response_id
+        suppress_outbound = False
+        current_response_id = (event.response and event.response.id) or event.id
+
+    def on_audio_delta(event):
+        return play_delta(event.delta)
+
+    def on_speech_started(event):
+        return hard_cancel(clear_input=False) if speaking else None
+
+    def on_audio_done(event):
+        nonlocal speaking, current_response_id, last_cancelled_id
+        speaking = False
+        current_response_id = None
+        last_cancelled_id = None
+
+    handlers = {
+        "response.created": on_response_created,
+        "response.output_audio.delta": on_audio_delta,
+        "input_audio_buffer.speech_started": on_speech_started,
+        "response.output_audio.done": on_audio_done,
+    }
 
     async def openai_to_twilio():
-        nonlocal speaking, suppress_outbound, current_response_id
         try:
             async for message in openai_ws:
-                event = json.loads(message)
-                t = event.get("type")
-
-                if t == "response.created":
-                    suppress_outbound = False
-                    current_response_id = (event.get("response") or {}).get("id") or event.get("id")
-
-                if t == "response.output_audio.delta":
-                    if not suppress_outbound:
-                        delta_b64 = event.get("delta")
-                        if delta_b64:
-                            speaking = True
-                            await twilio_ws.send_text(json.dumps({
-                                "event": "media",
-                                "streamSid": stream_sid,
-                                "media": {"payload": delta_b64}
-                            }))
-
-                elif t == "response.output_audio.done":
-                    speaking = False
-                    current_response_id = None
-                    await openai_ws.send(json.dumps({"type": "input_audio_buffer.clear"}))
+                # Fast path: audio deltas never get parsed (text frames only;
+                # decode_openai takes bytes as well)
+                if isinstance(message, str):
+                    delta_b64 = raw_audio_delta(message)
+                    if delta_b64 is not None:
+                        pending = play_delta(delta_b64)
+                        if pending is not None:
+                            await pending
+                        continue
+
+                event = decode_openai(message)
+                if event is None:
+                    continue
+                handler = handlers.get(event.type)
+                if handler is not None:
+                    pending = handler(event)
+                    if pending is not None:
+                        await pending
         except Exception:
             pass
 
-    await asyncio.gather(twilio_to_openai(), openai_to_twilio())
+    tasks = {
+        asyncio.create_task(twilio_to_openai(), name="t2o"),
+        asyncio.create_task(openai_to_twilio(), name="o2t"),
+    }
+    writer_task = asyncio.create_task(twilio_writer(), name="twilio_writer")
+    # when either side finishes the call is over; don't leave the other one running
+    _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    if commit_timer is not None:
+        commit_timer.cancel()
+    leftovers = [*pending, writer_task]
+    if commit_task is not None:
+        leftovers.append(commit_task)
+    for task in leftovers:
+        task.cancel()
+    await asyncio.gather(*leftovers, return_exceptions=True)
 
     try:
         await openai_ws.close()
@@ -1,23 +1,27 @@
 import os
 from fastapi import FastAPI, Request
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import Response
 from twilio.twiml.voice_response import VoiceResponse
 
 app = FastAPI()
 
+def _build_twiml(base: str) -> str:
+    host = base.split("://")[1]
+    vr = VoiceResponse()
+    # No <Say> here; the greeting will come from realtime.py
+    vr.connect().stream(url=f"wss://{host}/ws")
+    return str(vr)
+
+# BASE_URL is fixed for the process, so the TwiML is built once
+_TWIML = _build_twiml(os.environ.get("BASE_URL", "https://example.com")).encode()
+
 @app.get("/health")
 def health():
     return {"ok": True}
 
 @app.post("/voice")
 async def voice(request: Request):
-    base = os.environ.get("BASE_URL", "https://example.com")
-    host = base.split("://")[1]
-
-    vr = VoiceResponse()
-    # No <Say> here; the greeting will come from realtime.py
-    vr.connect().stream(url=f"wss://{host}/ws")
-    return PlainTextResponse(str(vr), media_type="application/xml")
+    return Response(content=_TWIML, media_type="application/xml")
 
 from realtime import router as realtime_router
 app.include_router(realtime_router)